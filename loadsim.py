@@ -0,0 +1,400 @@
+# loadsim.py
+#
+# Load simulator for registration rushes (class opening, Monday-morning PT
+# booking). Virtual members are spread across a process pool and call the
+# operations in app/main.py against a local database, then the results are
+# checked for capacity and double-booking violations.
+#
+#   python3 loadsim.py --workers 8 --duration 20 --class-rate 80 --pt-rate 40
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+import multiprocessing
+
+DEFAULT_DATABASE_URL = "sqlite:///loadsim.db"
+
+# Printed by the app functions when the operation went through
+SUCCESS_MARKERS = {
+    "register_for_class": "registered in class",
+    "admin_book_pt_session": "Booked PT session",
+    "log_health_metric": "Logged health metric",
+}
+
+
+# ----------------------------------------------------
+#   SEEDING
+# ----------------------------------------------------
+
+def next_monday(now):
+    days = (7 - now.weekday()) % 7 or 7
+    return (now + timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def seed(args, tag):
+    # Import here so DATABASE_URL is already set for app.database
+    from app.database import SessionLocal, init_db, engine
+    from models.models import Base, Member, Trainer, Room, GroupClass
+
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    init_db()
+
+    session = SessionLocal()
+    monday = next_monday(datetime.now())
+
+    members = [Member(name=f"Sim Member {i}", email=f"sim-{tag}-m{i}@fitclub.test")
+               for i in range(args.members)]
+    trainers = [Trainer(name=f"Sim Trainer {i}", email=f"sim-{tag}-t{i}@fitclub.test",
+                        specialty="Load")
+                for i in range(args.trainers)]
+    rooms = [Room(name=f"Sim Room {tag}-{i}", capacity=args.class_capacity)
+             for i in range(args.rooms)]
+    session.add_all(members + trainers + rooms)
+    session.flush()
+
+    # By default classes share the PT slots, so PT bookings that ignore them
+    # show up as trainer/room double-bookings. Classes in the same slot get
+    # different trainers and rooms so the seed itself never clashes.
+    classes = []
+    for i in range(args.classes):
+        if args.classes_after_pt:
+            start = monday + timedelta(hours=6 + args.slots + i)
+        else:
+            start = monday + timedelta(hours=6 + i % args.slots)
+        k = i if args.classes_after_pt else i // args.slots
+        classes.append(GroupClass(
+            name=f"Sim Class {i}",
+            trainer_id=trainers[k % len(trainers)].id,
+            room_id=rooms[k % len(rooms)].id,
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            capacity=args.class_capacity
+        ))
+    session.add_all(classes)
+    session.commit()
+
+    # PT slots: hourly from 06:00 on Monday
+    slots = [monday + timedelta(hours=6 + i) for i in range(args.slots)]
+
+    world = {
+        "member_ids": [m.id for m in members],
+        "trainer_ids": [t.id for t in trainers],
+        "room_ids": [r.id for r in rooms],
+        "class_ids": [c.id for c in classes],
+        "slots": slots,
+    }
+    session.close()
+    return world
+
+
+# ----------------------------------------------------
+#   ARRIVALS
+# ----------------------------------------------------
+
+def poisson_arrivals(rng, rate, duration):
+    # Open-loop arrival times (seconds from start) at `rate` per second
+    times = []
+    if rate <= 0:
+        return times
+    t = rng.expovariate(rate)
+    while t < duration:
+        times.append(t)
+        t += rng.expovariate(rate)
+    return times
+
+
+def build_schedule(args, world, rng):
+    schedule = []
+
+    for t in poisson_arrivals(rng, args.class_rate, args.duration):
+        schedule.append((t, "register_for_class", {
+            "member_id": rng.choice(world["member_ids"]),
+            "class_id": rng.choice(world["class_ids"]),
+        }))
+
+    for t in poisson_arrivals(rng, args.pt_rate, args.duration):
+        start = rng.choice(world["slots"])
+        schedule.append((t, "admin_book_pt_session", {
+            "member_id": rng.choice(world["member_ids"]),
+            "trainer_id": rng.choice(world["trainer_ids"]),
+            "room_id": rng.choice(world["room_ids"]),
+            "start_time": start,
+            "end_time": start + timedelta(hours=1),
+        }))
+
+    for t in poisson_arrivals(rng, args.metric_rate, args.duration):
+        schedule.append((t, "log_health_metric", {
+            "member_id": rng.choice(world["member_ids"]),
+            "weight": round(rng.uniform(50, 110), 1),
+            "heart_rate": rng.randint(55, 180),
+            "body_fat": round(rng.uniform(8, 35), 1),
+        }))
+
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+# ----------------------------------------------------
+#   WORKERS
+# ----------------------------------------------------
+
+# Set in each pool process by init_worker
+_ops = None
+_SessionLocal = None
+
+
+def init_worker():
+    # Pay for imports, model mapping and the first connection before the rush
+    global _ops, _SessionLocal
+    import app.main as ops
+    from app.database import SessionLocal, engine
+
+    with engine.connect():
+        pass
+    _ops, _SessionLocal = ops, SessionLocal
+
+
+def wait_ready(barrier):
+    # Blocks until every pool process has finished init_worker
+    barrier.wait()
+
+
+def run_worker(start_at, arrivals):
+    # Runs in a pool process: replay this worker's share of the arrivals
+    results = []
+    for offset, op_name, kwargs in arrivals:
+        delay = start_at + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        lag = max(0.0, time.time() - (start_at + offset))
+
+        session = _SessionLocal()
+        out = io.StringIO()
+        began = time.perf_counter()
+        try:
+            with redirect_stdout(out):
+                getattr(_ops, op_name)(session, **kwargs)
+            lines = out.getvalue().strip().splitlines()
+            message = lines[-1] if lines else "no output"
+            outcome = "ok" if SUCCESS_MARKERS[op_name] in message else message
+        except Exception as e:
+            session.rollback()
+            outcome = f"error: {type(e).__name__}"
+        latency = time.perf_counter() - began
+        session.close()
+
+        results.append((op_name, outcome, latency, lag))
+
+    return results
+
+
+def simulate(args, schedule):
+    # Round-robin so every worker sees the same mix and arrival density
+    shares = [schedule[i::args.workers] for i in range(args.workers)]
+    ctx = multiprocessing.get_context("spawn")
+
+    with ctx.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                                initializer=init_worker) as pool:
+        # Each wait_ready call holds a process until all of them have
+        # started, so every worker is initialised before the clock starts
+        barrier = manager.Barrier(args.workers)
+        list(pool.map(wait_ready, [barrier] * args.workers))
+        start_at = time.time() + 0.1
+        futures = [pool.submit(run_worker, start_at, share) for share in shares]
+        results = [r for f in futures for r in f.result()]
+        # start_at is slightly in the future, so a tiny schedule can finish "before" it
+        elapsed = max(time.time() - start_at, 1e-9)
+
+    return results, elapsed
+
+
+# ----------------------------------------------------
+#   REPORTING
+# ----------------------------------------------------
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def report(results, elapsed):
+    by_op = defaultdict(list)
+    for row in results:
+        by_op[row[0]].append(row)
+
+    # Service time runs from the call starting; response time runs from its
+    # scheduled arrival, so queueing in a backed-up pool shows up in it too
+    print(f"\n=== LOAD RESULTS ({elapsed:.1f}s wall, latencies in ms) ===")
+    print(f"{'operation':<24}{'calls':>7}{'ops/s':>9}"
+          f"{'svc p50':>9}{'svc p95':>9}{'svc p99':>9}"
+          f"{'resp p50':>10}{'resp p95':>10}{'resp p99':>10}")
+    for op_name in SUCCESS_MARKERS:
+        rows = by_op.get(op_name, [])
+        if not rows:
+            continue
+        service = sorted(r[2] * 1000 for r in rows)
+        response = sorted((r[3] + r[2]) * 1000 for r in rows)
+        print(f"{op_name:<24}{len(rows):>7}{len(rows) / elapsed:>9.1f}"
+              f"{percentile(service, 50):>9.1f}{percentile(service, 95):>9.1f}"
+              f"{percentile(service, 99):>9.1f}"
+              f"{percentile(response, 50):>10.1f}{percentile(response, 95):>10.1f}"
+              f"{percentile(response, 99):>10.1f}")
+
+    print(f"{'total':<24}{len(results):>7}{len(results) / elapsed:>9.1f}")
+
+    print("\nOutcomes:")
+    for op_name in SUCCESS_MARKERS:
+        counts = defaultdict(int)
+        for r in by_op.get(op_name, []):
+            counts[r[1]] += 1
+        for outcome, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+            print(f"  {op_name:<24}{n:>7}  {outcome}")
+
+
+# ----------------------------------------------------
+#   CORRECTNESS CHECKS
+# ----------------------------------------------------
+
+def find_overlaps(bookings):
+    # bookings: (key, label, start, end); returns every overlapping pair per key
+    clashes = []
+    by_key = defaultdict(list)
+    for key, label, start, end in bookings:
+        by_key[key].append((start, end, label))
+    for key, items in by_key.items():
+        items.sort()
+        active = []
+        for start, end, label in items:
+            active = [(e, l) for e, l in active if e > start]
+            clashes.extend((key, l, label) for e, l in active)
+            active.append((end, label))
+    return clashes
+
+
+def check_invariants(world):
+    from sqlalchemy import func
+    from app.database import SessionLocal
+    from models.models import GroupClass, ClassRegistration, PersonalTrainingSession
+
+    session = SessionLocal()
+    problems = []
+
+    counts = dict(session.query(ClassRegistration.class_id, func.count(ClassRegistration.id))
+                  .filter(ClassRegistration.class_id.in_(world["class_ids"]))
+                  .group_by(ClassRegistration.class_id)
+                  .all())
+    for gc in session.query(GroupClass).filter(GroupClass.id.in_(world["class_ids"])):
+        if counts.get(gc.id, 0) > gc.capacity:
+            problems.append(f"Class #{gc.id} has {counts[gc.id]} registrations for capacity {gc.capacity}")
+
+    duplicates = session.query(ClassRegistration.member_id, ClassRegistration.class_id)\
+                        .filter(ClassRegistration.class_id.in_(world["class_ids"]))\
+                        .group_by(ClassRegistration.member_id, ClassRegistration.class_id)\
+                        .having(func.count(ClassRegistration.id) > 1)\
+                        .all()
+    for member_id, class_id in duplicates:
+        problems.append(f"Member #{member_id} registered more than once in class #{class_id}")
+
+    # Trainers and rooms are booked by both PT sessions and group classes
+    pt = session.query(PersonalTrainingSession).filter(
+        PersonalTrainingSession.trainer_id.in_(world["trainer_ids"])
+    ).all()
+    classes = session.query(GroupClass).filter(GroupClass.id.in_(world["class_ids"])).all()
+    bookings = [(s, f"PT session #{s.id}") for s in pt] + [(c, f"class #{c.id}") for c in classes]
+    class_labels = {f"class #{c.id}" for c in classes}
+
+    # admin_book_pt_session never looks at group classes, so a PT session on
+    # top of a class is a known gap in the app rather than a race
+    known_gaps = []
+    for kind, attr in (("Trainer", "trainer_id"), ("Room", "room_id")):
+        for key, a, b in find_overlaps(
+                [(getattr(o, attr), label, o.start_time, o.end_time) for o, label in bookings]):
+            line = f"{kind} #{key} double-booked: {a} overlaps {b}"
+            if (a in class_labels) != (b in class_labels):
+                known_gaps.append(line)
+            else:
+                problems.append(line)
+
+    session.close()
+    return problems, known_gaps
+
+
+# ----------------------------------------------------
+#   MAIN
+# ----------------------------------------------------
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Simulate concurrent booking rushes against a local database.")
+    p.add_argument("--database-url", default=DEFAULT_DATABASE_URL,
+                   help=f"SQLAlchemy URL to load (default: {DEFAULT_DATABASE_URL})")
+    p.add_argument("--reset", action="store_true", help="drop and recreate all tables before seeding")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="pool processes (virtual members in flight)")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals to generate")
+    p.add_argument("--class-rate", type=float, default=50.0, help="class registrations per second")
+    p.add_argument("--pt-rate", type=float, default=20.0, help="PT booking attempts per second")
+    p.add_argument("--metric-rate", type=float, default=10.0, help="health metric logs per second")
+    p.add_argument("--members", type=int, default=500)
+    p.add_argument("--trainers", type=int, default=5)
+    p.add_argument("--rooms", type=int, default=3)
+    p.add_argument("--classes", type=int, default=3)
+    p.add_argument("--class-capacity", type=int, default=20)
+    p.add_argument("--slots", type=int, default=4, help="hourly Monday-morning PT slots")
+    p.add_argument("--classes-after-pt", action="store_true",
+                   help="schedule classes after the PT slots instead of inside them")
+    p.add_argument("--seed", type=int, default=None, help="random seed for a repeatable schedule")
+    args = p.parse_args(argv)
+
+    if min(args.workers, args.members, args.trainers, args.rooms, args.classes, args.slots) < 1:
+        p.error("workers, members, trainers, rooms, classes and slots must all be at least 1")
+    if max(args.class_rate, args.pt_rate, args.metric_rate) <= 0:
+        p.error("at least one of --class-rate, --pt-rate and --metric-rate must be above 0")
+    if not args.classes_after_pt and args.classes > args.slots * min(args.trainers, args.rooms):
+        p.error("too many classes to fit in the PT slots without sharing a trainer or room; "
+                "lower --classes, raise --slots/--trainers/--rooms or pass --classes-after-pt")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # app.database reads this at import time, in this process and in the pool
+    os.environ["DATABASE_URL"] = args.database_url
+
+    tag = uuid.uuid4().hex[:8]
+    world = seed(args, tag)
+    schedule = build_schedule(args, world, random.Random(args.seed))
+    print(f"Run {tag}: {len(schedule)} arrivals over {args.duration:.0f}s on {args.workers} workers")
+
+    results, elapsed = simulate(args, schedule)
+    report(results, elapsed)
+
+    problems, known_gaps = check_invariants(world)
+    print("\n=== CORRECTNESS CHECKS ===")
+    if known_gaps:
+        print(f"Known gap (PT booking does not check group classes), "
+              f"not counted as a failure: {len(known_gaps)} clash(es)")
+        for gap in known_gaps:
+            print(f"  KNOWN GAP: {gap}")
+    if not problems:
+        print("No capacity or double-booking violations found.")
+        return 0
+    for problem in problems:
+        print(f"  VIOLATION: {problem}")
+    print(f"{len(problems)} violation(s) found.")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())